@@ -1,7 +1,483 @@
+import base64
+import concurrent.futures
+import dataclasses
+import functools
+import io
+import itertools
+import logging
+import operator
+import os
+import types
+from collections.abc import Mapping
+
 from impedance.models.circuits import circuits
+from impedance.models.circuits.elements import circuit_elements, get_element_from_name
+from impedance.models.circuits.fitting import calculateCircuitLength
 import schemdraw
 import schemdraw.elements as elm
+from schemdraw.segments import Segment, SegmentCircle
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.gridspec import GridSpec
+from matplotlib.transforms import offset_copy
+
+try:
+    import numba
+except ImportError:  # numba is optional, chi2 falls back to NumPy
+    numba = None
+
+logger = logging.getLogger(__name__)
+
+# Read-only map from circuit string component types to schemdraw elements.
+# All impedance.py types, including R, C and L, are drawn as boxes.
+_COMPONENT_MAP: Mapping[str, type] = types.MappingProxyType({
+    'R': elm.RBox,
+    'C': elm.RBox,
+    'L': elm.RBox,
+    'D': elm.Diode,
+    'LED': elm.LED,
+    'BAT': elm.Battery,
+    'SW': elm.Switch,
+    'GND': elm.Ground,
+    's': elm.RBox,
+    'p': elm.RBox,
+    'W': elm.RBox,
+    'Wo': elm.RBox,
+    'Ws': elm.RBox,
+    'CPE': elm.RBox,
+    'Q': elm.RBox,
+    'La': elm.RBox,
+    'G': elm.RBox,
+    'Gs': elm.RBox,
+    'K': elm.RBox,
+    'Zarc': elm.RBox,
+    'TLMQ': elm.RBox,
+    'T': elm.RBox,
+})
+
+# Drawing directions: method orienting an element, unit vector along the
+# direction and unit vector along which parallel branches are stacked
+_DIR_TABLE = types.MappingProxyType({
+    'right': (operator.methodcaller('right'), (1, 0), (0, 1)),
+    'left': (operator.methodcaller('left'), (-1, 0), (0, 1)),
+    'up': (operator.methodcaller('up'), (0, 1), (1, 0)),
+    'down': (operator.methodcaller('down'), (0, -1), (1, 0)),
+})
+
+# Component types, longest first so that e.g. 'CPE1' matches 'CPE' before 'C'
+_TYPES_SORTED = tuple(sorted(_COMPONENT_MAP, key=len, reverse=True))
+
+# Types drawn with one-terminal symbols (e.g. GND), which can't be connected
+# in a series chain or a parallel branch
+_TERMINAL_TYPES = frozenset(
+    comp_type for comp_type, element_class in _COMPONENT_MAP.items()
+    if not issubclass(element_class, elm.Element2Term)
+)
+
+
+# Length of a single component and of each parallel branch, matches the
+# default length of two-terminal elements in schemdraw
+_BRANCH_LENGTH = 3
+
+# Radius of the junction dots, same as the elm.Dot default
+_DOT_RADIUS = 0.075
+
+# Characters that end a component name in a circuit string
+_DELIMITERS = frozenset('(),- \t\n')
+
+
+def _split_comp(part):
+    """
+    Split a component name into its type and identifier, e.g. 'CPE1' -> ('CPE', '1').
+
+    The longest type in _COMPONENT_MAP that prefixes the name wins. Returns
+    (None, part) if no type matches.
+    """
+    for comp_type in _TYPES_SORTED:
+        if part.startswith(comp_type):
+            return comp_type, part[len(comp_type):]
+    return None, part
+
+
+def _parse_series(circuit, pos=0):
+    """
+    Recursive descent parser for a series chain of the circuit string.
+
+    The string is scanned in place by index, only component names are sliced
+    out of it. Parsing stops at the end of the string or at a ',' / ')'
+    closing the enclosing parallel block, which is left for the caller to
+    consume.
+
+    Returns:
+    - chain: tuple of (kind, value, element_class) nodes, where kind is
+      'component' (value is the component name, element_class its schemdraw
+      element), 'unknown' (a component whose type isn't in _COMPONENT_MAP,
+      element_class is None), 'terminal' (a one-terminal component such as
+      GND, which isn't drawn) or 'parallel' (value is a tuple of chains,
+      element_class is None)
+    - pos: index of the first character that wasn't consumed
+    """
+    chain = []
+    n = len(circuit)
+    while pos < n:
+        char = circuit[pos]
+        if char == 'p' and circuit.startswith('(', pos + 1):
+            start = pos
+            pos += 2
+            branches = []
+            while True:
+                branch, pos = _parse_series(circuit, pos)
+                branches.append(branch)
+                if pos >= n:
+                    raise ValueError(f"Unclosed 'p(' at position {start} in circuit string '{circuit}'")
+                pos += 1
+                if circuit[pos - 1] == ')':
+                    break
+            chain.append(('parallel', tuple(branches), None))
+        elif char in ',)':
+            break
+        elif char == '-' or char.isspace():
+            pos += 1
+        elif char == '(':
+            raise ValueError(f"Unexpected '(' at position {pos} in circuit string '{circuit}'")
+        else:
+            # Component names are the only text sliced out of the string,
+            # their element class is resolved once here for every draw
+            end = pos + 1
+            while end < n and circuit[end] not in _DELIMITERS:
+                end += 1
+            part = circuit[pos:end]
+            comp_type, _ = _split_comp(part)
+            if comp_type is None:
+                chain.append(('unknown', part, None))
+            elif comp_type in _TERMINAL_TYPES:
+                chain.append(('terminal', part, _COMPONENT_MAP[comp_type]))
+            else:
+                chain.append(('component', part, _COMPONENT_MAP[comp_type]))
+            pos = end
+    return tuple(chain), pos
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_circuit(circuit):
+    """
+    Parse a whole circuit string into a series chain (see _parse_series).
+
+    The chain is made of tuples only, so it is cached and shared between
+    drawing and prediction of the same circuit string.
+    """
+    chain, pos = _parse_series(circuit)
+    if pos < len(circuit):
+        raise ValueError(f"Unexpected '{circuit[pos]}' at position {pos} in circuit string '{circuit}'")
+    return chain
+
+
+def _warn_skipped(kind, part):
+    """Warn about a component of the given node kind that can't be drawn."""
+    if kind == 'terminal':
+        logger.warning("One-terminal component %r can't be connected in series or parallel, skipping it", part)
+    else:
+        logger.warning("Unknown component type %r in %r", part[0], part)
+
+
+def _parallel_entries(branches):
+    """
+    Convert parsed parallel branches into (element, label) entries.
+
+    Branches made of a single known component become element classes labelled
+    with the component name, longer branches are kept as unlabelled series
+    chains. Empty branches are dropped.
+
+    Returns:
+    - entries: tuple of (element, label) pairs
+    - skipped: (kind, component) pairs of single-component branches that
+      can't be drawn (see _warn_skipped)
+    """
+    entries = []
+    skipped = []
+    for branch in branches:
+        if len(branch) == 1 and branch[0][0] != 'parallel':
+            kind, comp, element_class = branch[0]
+            if kind == 'component':
+                entries.append((element_class, comp))
+            else:
+                skipped.append((kind, comp))
+        elif branch:
+            entries.append((branch, None))
+    return tuple(entries), skipped
+
+
+def _series_extent(chain, spacing):
+    """Length along the drawing direction and perpendicular span of a series chain."""
+    length = 0
+    span = 0
+    for kind, value, _ in chain:
+        if kind == 'parallel':
+            entries, _ = _parallel_entries(value)
+            if not entries:
+                # Blocks without drawable branches are skipped by _series_ops
+                continue
+            item_length, item_span = _parallel_extent(entries, spacing)
+        elif kind == 'component':
+            item_length, item_span = _BRANCH_LENGTH, 0
+        else:
+            continue
+        length += item_length
+        span = max(span, item_span)
+    return length, span
+
+
+def _entry_extent(element, spacing):
+    """Length and perpendicular span of a parallel entry (series chain or element factory)."""
+    # Parsed chains are always tuples, anything else builds a single element
+    if isinstance(element, tuple):
+        return _series_extent(element, spacing)
+    return _BRANCH_LENGTH, 0
+
+
+def _parallel_extent(entries, spacing):
+    """Length and perpendicular span of a parallel combination of (element, label) entries."""
+    extents = [_entry_extent(element, spacing) for element, _ in entries]
+    length = max((extent[0] for extent in extents), default=_BRANCH_LENGTH)
+    span = sum(extent[1] for extent in extents) + spacing * (len(extents) - 1)
+    return length, span
+
+
+class _Wires(elm.Element):
+    """
+    Plain wires and junction dots drawn as a single schemdraw element.
+
+    Like elm.Dot, the element is never rotated and keeps the drawing's
+    direction, so the coordinates below are relative to where it is placed.
+
+    Parameters:
+    - wires: sequence of ((x0, y0), (x1, y1)) pairs
+    - dots: sequence of (x, y) junctions, drawn like elm.Dot over the wires
+    - end: (x, y) point where the drawing continues after this element, so
+      elements added next attach to the block's end junction
+    """
+    def __init__(self, wires, dots=(), end=(0, 0), **kwargs):
+        super().__init__(**kwargs)
+        self.segments.extend(Segment([wire_start, wire_end]) for wire_start, wire_end in wires if wire_start != wire_end)
+        self.segments.extend(SegmentCircle(dot, _DOT_RADIUS, fill=True, zorder=4) for dot in dots)
+        self.anchors['start'] = (0, 0)
+        self.anchors['end'] = end
+        self.elmparams['drop'] = end
+        self.elmparams['theta'] = 0
+
+
+def _branch_coords(start_pos, end_pos, stack, offsets):
+    """
+    Start and end points of parallel branches, for all branches at once.
+
+    Parameters:
+    - start_pos, end_pos: (x, y) positions of the block's junctions
+    - stack: (x, y) unit vector along which the branches are stacked
+    - offsets: float array with the offset of each branch's centre line
+
+    Returns:
+    - float array of shape (n_branches, 4) with (start_x, start_y, end_x, end_y) rows
+    """
+    junctions = np.array([start_pos[0], start_pos[1], end_pos[0], end_pos[1]], dtype=np.float64)
+    stack = np.array([stack[0], stack[1], stack[0], stack[1]], dtype=np.float64)
+    return junctions + offsets[:, np.newaxis] * stack
+
+
+def _parallel_layout(entries, direction, spacing):
+    """
+    Lay out a parallel combination of (element, label) entries as placement
+    ops (see _add_ops), with the starting junction at the origin.
+
+    The layout doesn't depend on where the block is drawn, so _parallel_ops
+    only has to translate it (see also _parsed_parallel_layout).
+
+    Returns:
+    - ops: tuple of placement ops
+    - end_pos: position of the final junction
+    """
+    start_pos = (0, 0)
+
+    # Unit vector along the drawing direction; branches are stacked along
+    # the perpendicular one. Looked up once for the whole block.
+    orient, (dx, dy), (px, py) = _DIR_TABLE[direction]
+    step_x, step_y = dx * _BRANCH_LENGTH, dy * _BRANCH_LENGTH
+
+    # Degenerate blocks need no junctions: no branches is a plain wire, a
+    # single branch is drawn inline
+    if not entries:
+        end_pos = (step_x, step_y)
+        return ((functools.partial(_Wires, ((start_pos, end_pos),), end=end_pos), None, start_pos, None, None),), end_pos
+    if len(entries) == 1:
+        (element_class, label), = entries
+        if isinstance(element_class, tuple):
+            ops, end_pos = _series_ops(element_class, start_pos, direction, spacing)
+            return tuple(ops), end_pos
+        end_pos = (step_x, step_y)
+        return ((element_class, label, start_pos, end_pos, orient),), end_pos
+
+    # Length and perpendicular span of each branch; nested branches are wider
+    extents = [_entry_extent(element, spacing) for element, _ in entries]
+
+    # Calculate total height/width needed
+    total_span = sum(span for _, span in extents) + spacing * (len(entries) - 1)
+
+    ops = []
+
+    # The parallel network is as long as its longest branch
+    branch_length = max((length for length, _ in extents), default=_BRANCH_LENGTH)
+
+    # End position of the parallel network
+    end_pos = (start_pos[0] + dx * branch_length, start_pos[1] + dy * branch_length)
+
+    # Wires connecting the junctions to the branches, as (start, end) pairs
+    wires = []
+
+    # Offsets of the branches' centre lines from start_pos, computed in one
+    # go: each branch starts after the spans and spacings of the previous ones
+    spans = np.array([span for _, span in extents], dtype=np.float64)
+    offsets = np.cumsum(spans + spacing) - spans / 2 - spacing - total_span / 2
+
+    # Starting and ending positions of every branch
+    coords = _branch_coords(start_pos, end_pos, (px, py), offsets)
+
+    for (element_class, label), (start_x, start_y, end_x, end_y) in zip(entries, coords.tolist()):
+        branch_start = (start_x, start_y)
+        branch_end = (end_x, end_y)
+
+        # Line from main junction to branch start
+        wires.append((start_pos, branch_start))
+
+        if isinstance(element_class, tuple):
+            # Nested series chain
+            chain_ops, element_end = _series_ops(element_class, branch_start, direction, spacing)
+            ops.extend(chain_ops)
+        else:
+            # Add the element in the middle of the branch, stretched to the
+            # branch length whatever its own default length is
+            element_end = (start_x + step_x, start_y + step_y)
+            ops.append((element_class, label, branch_start, element_end, orient))
+
+        # Line from element end to end junction, then from branch end to
+        # the main end junction
+        wires.append((element_end, branch_end))
+        wires.append((branch_end, end_pos))
+
+    # All wires and both junctions of the block are drawn by one element,
+    # placed at the starting junction
+    ops.append((functools.partial(_Wires, tuple(wires), (start_pos, end_pos), end_pos), None, start_pos, None, None))
+
+    return tuple(ops), end_pos
+
+
+@functools.lru_cache(maxsize=256)
+def _parsed_parallel_layout(entries, direction, spacing):
+    """
+    Cached _parallel_layout for blocks parsed from circuit strings.
+
+    Parsed entries only hold element classes and name strings, so repeated
+    blocks, e.g. the same p(R1,C1) in several circuit strings, are laid out
+    once. Entries passed to draw_parallel_elements may be unhashable or
+    one-off factories and are laid out without the cache.
+    """
+    return _parallel_layout(entries, direction, spacing)
+
+
+def _parallel_ops(entries, start_pos, direction, spacing, layout=_parsed_parallel_layout):
+    """
+    Lay out a parallel combination of (element, label) entries as placement
+    ops (see _add_ops), by translating its layout to start_pos.
+
+    Parameters:
+    - layout: function computing the layout at the origin, the cached
+      _parsed_parallel_layout by default for parsed entries
+
+    Returns:
+    - ops: list of placement ops
+    - end_pos: position of the final junction
+    """
+    origin_ops, (end_x, end_y) = layout(entries, direction, spacing)
+    x0, y0 = start_pos
+    ops = [
+        (element_class, label, (at[0] + x0, at[1] + y0), to if to is None else (to[0] + x0, to[1] + y0), orient)
+        for element_class, label, at, to, orient in origin_ops
+    ]
+    return ops, (end_x + x0, end_y + y0)
+
+
+def _series_ops(chain, start_pos, direction, spacing):
+    """
+    Lay out a series chain parsed from the circuit string as placement ops (see _add_ops).
+
+    Returns:
+    - ops: list of placement ops
+    - end_pos: the position where the chain ends
+    """
+    ops = []
+
+    # Orientation and offset covered by one component, looked up once for
+    # the whole chain
+    orient, (dx, dy), _ = _DIR_TABLE[direction]
+    step_x, step_y = dx * _BRANCH_LENGTH, dy * _BRANCH_LENGTH
+
+    # Current position in the drawing, kept as plain locals
+    x, y = start_pos
+
+    for kind, value, element_class in chain:
+        # Check if this part is a parallel combination
+        if kind == 'parallel':
+            # Convert component strings to schemdraw elements
+            entries, skipped = _parallel_entries(value)
+            for skipped_kind, comp in skipped:
+                _warn_skipped(skipped_kind, comp)
+
+            # Draw the parallel combination
+            if entries:
+                parallel_ops, (x, y) = _parallel_ops(entries, (x, y), direction, spacing)
+                ops.extend(parallel_ops)
+
+        # Individual component, its element class was resolved by the parser
+        elif kind == 'component':
+            # The component is stretched to exactly one step, so the next one
+            # starts where it ends
+            ops.append((element_class, value, (x, y), (x + step_x, y + step_y), orient))
+
+            # Update current position
+            x += step_x
+            y += step_y
+        else:
+            _warn_skipped(kind, value)
+
+    return ops, (x, y)
+
+
+def _add_ops(drawing, ops):
+    """
+    Build fresh schemdraw elements from placement ops and add them to the drawing.
+
+    A placement op is a tuple (element_class, label, at, to, orient): the
+    element is labelled once (if label isn't None), placed at `at`, then
+    drawn to `to` and/or oriented by calling `orient` (an orientation method
+    from _DIR_TABLE, resolved when the ops were laid out) on it. Components
+    get `to` set to the end the layout assumed, so they connect to the wires
+    whatever their own length (e.g. in a Drawing with a different unit).
+    """
+    batch = []
+    for element_class, label, at, to, orient in ops:
+        element = element_class()
+        if label:
+            element.label(label)
+        element.at(at)
+        if to is not None and isinstance(element, elm.Element2Term):
+            # One-terminal elements from custom factories can't be stretched
+            element.to(to)
+        if orient is not None:
+            orient(element)
+        batch.append(element)
+
+    # Elements are added to the drawing in one call
+    drawing.add_elements(*batch)
+
 
 def draw_parallel_elements(drawing, elements, start_pos=(0, 0), direction='right', spacing=1, labels=None) -> schemdraw.Drawing:
     """
@@ -10,6 +486,8 @@ def draw_parallel_elements(drawing, elements, start_pos=(0, 0), direction='right
     Parameters:
     - drawing: schemdraw.Drawing object to add elements to
     - elements: list of schemdraw element classes (e.g., [elm.Resistor, elm.Capacitor])
+      or other callables returning an element (e.g., functools.partial(elm.Resistor, color='red'));
+      an entry can also be a series chain parsed by draw_circuit, for nested circuits
     - start_pos: tuple (x, y) for starting position
     - direction: 'right', 'left', 'up', or 'down' for the parallel orientation
     - spacing: vertical/horizontal spacing between parallel elements
@@ -18,97 +496,51 @@ def draw_parallel_elements(drawing, elements, start_pos=(0, 0), direction='right
     Returns:
     - drawing: the updated schemdraw.Drawing object
     """
+    if direction not in _DIR_TABLE:
+        raise ValueError(f"Unknown direction '{direction}', expected one of {list(_DIR_TABLE)}")
     if labels is None:
-        labels = [None] * len(elements)
+        # Unlabelled elements, zip() stops at the last element
+        labels = itertools.repeat(None)
 
-    # Determine perpendicular direction for spacing
-    if direction in ['right', 'left']:
-        perp_dir = 'down'
-        rev_perp_dir = 'up'
-    else:
-        perp_dir = 'right'
-        rev_perp_dir = 'left'
+    # Caller-supplied entries bypass the layout cache
+    ops, _ = _parallel_ops(tuple(zip(elements, labels)), tuple(start_pos), direction, spacing, layout=_parallel_layout)
+    _add_ops(drawing, ops)
 
-    # Calculate total height/width needed
-    total_span = spacing * (len(elements) - 1)
-
-    # Draw starting junction
-    junction1 = elm.Dot().at(start_pos)
-    drawing += junction1
-
-    # Define the length of each branch
-    branch_length = 3  # Arbitrary length for each branch
+    return drawing
 
-    # End position of the parallel network
-    if direction == 'right':
-        end_x = start_pos[0] + branch_length
-        end_pos = (end_x, start_pos[1])
-    elif direction == 'left':
-        end_x = start_pos[0] - branch_length
-        end_pos = (end_x, start_pos[1])
-    elif direction == 'up':
-        end_y = start_pos[1] + branch_length
-        end_pos = (start_pos[0], end_y)
-    else:  # down
-        end_y = start_pos[1] - branch_length
-        end_pos = (start_pos[0], end_y)
-
-    # Add final junction
-    junction2 = elm.Dot().at(end_pos)
-    drawing += junction2
-
-    # Calculate the middle positions for each element
-    for i, (element_class, label) in enumerate(zip(elements, labels)):
-        # Calculate starting and ending positions for this branch
-        if direction in ['right', 'left']:
-            # For horizontal orientation, branches are stacked vertically
-            branch_y = start_pos[1] - total_span/2 + i * spacing
-            branch_start = (start_pos[0], branch_y)
-            branch_end = (end_pos[0], branch_y)
-        else:
-            # For vertical orientation, branches are stacked horizontally
-            branch_x = start_pos[0] - total_span/2 + i * spacing
-            branch_start = (branch_x, start_pos[1])
-            branch_end = (branch_x, end_pos[1])
-
-        # Draw line from main junction to branch start
-        drawing += elm.Line().at(start_pos).to(branch_start)
-
-        # Add the element in the middle of the branch
-        element = element_class().label(label)
-        if direction == 'right':
-            drawing += element.at(branch_start).right()
-        elif direction == 'left':
-            drawing += element.at(branch_start).left()
-        elif direction == 'up':
-            drawing += element.at(branch_start).up()
-        else:  # down
-            drawing += element.at(branch_start).down()
 
-        if label:
-            element.label(label)
+@functools.lru_cache(maxsize=128)
+def _circuit_recipe(circuit, start_pos, direction, spacing):
+    """
+    Parse and lay out a circuit string as a tuple of placement ops (see _add_ops).
 
-        # Draw line from element end to end junction
-        drawing += elm.Line().at(element.end).to(branch_end)
+    The recipe only depends on the arguments, so it is cached and repeated
+    draws of the same circuit skip parsing and layout.
+    """
+    # Parse the circuit string in a single scanning pass
+    chain = _parse_circuit(circuit)
 
-        # Connect branch end to main end junction
-        drawing += elm.Line().at(branch_end).to(end_pos)
+    ops, _ = _series_ops(chain, start_pos, direction, spacing)
+    return tuple(ops)
 
-    return drawing
 
 def draw_circuit(circuit, start_pos=(0, 0), direction='right', spacing=1) -> schemdraw.Drawing:
     """
     Draw an electronic circuit based on a string representation.
 
     Format:
-    - Component types: R (resistor), C (capacitor), L (inductor)
+    - Component types: R (resistor), C (capacitor), L (inductor) and the
+      other impedance.py types (CPE, W, Wo, La, ...), all drawn as boxes; the
+      longest matching type is used, so 'CPE1' is a CPE rather than a C
     - Component identifiers: numbers or strings after the component type
     - Series connection: indicated by '-'
-    - Parallel connection: indicated by 'p(comp1, comp2, ...)'
+    - Parallel connection: indicated by 'p(comp1, comp2, ...)', branches can
+      be series chains and parallel blocks can be nested
 
     Examples:
     - "R0-R1": Two resistors in series
     - "R0-p(R1, C1)-R2": Resistor, then parallel combination of R and C, then resistor
+    - "R0-p(R1-p(R2, C2), C1)": Nested parallel combination
 
     Parameters:
     - circuit_str: String representation of the circuit
@@ -120,123 +552,217 @@ def draw_circuit(circuit, start_pos=(0, 0), direction='right', spacing=1) -> sch
     - Drawing object with the circuit
     """
 
-    branch_length = 3
+    if direction not in _DIR_TABLE:
+        raise ValueError(f"Unknown direction '{direction}', expected one of {list(_DIR_TABLE)}")
 
-    # Create a new drawing
+    # Create a new drawing and build its elements from the cached recipe
     drawing = schemdraw.Drawing()
+    _add_ops(drawing, _circuit_recipe(circuit, tuple(start_pos), direction, spacing))
 
-    # Dictionary to map component letters to schemdraw elements
-    component_map = {
-        'R': elm.RBox,
-        'C': elm.Capacitor,
-        'L': elm.Inductor,
-        'D': elm.Diode,
-        'LED': elm.LED,
-        'BAT': elm.Battery,
-        'SW': elm.Switch,
-        'GND': elm.Ground,
-        's': elm.RBox,
-        'p': elm.RBox,
-        'R': elm.RBox,
-        'C': elm.RBox,
-        'L': elm.RBox,
-        'W': elm.RBox,
-        'Wo': elm.RBox,
-        'Ws': elm.RBox,
-        'CPE': elm.RBox,
-        'Q': elm.RBox,
-        'La': elm.RBox,
-        'G': elm.RBox,
-        'Gs': elm.RBox,
-        'K': elm.RBox,
-        'Zarc': elm.RBox,
-        'TLMQ': elm.RBox,
-        'T': elm.RBox,
-    }
-
-    # Current position in the drawing
-    current_pos = start_pos
-
-    # Parse the circuit string
-    parts = circuit.split('-')
-
-    for i, part in enumerate(parts):
-        part = part.strip()
+    return drawing
 
-        # Check if this part is a parallel combination
-        if part.startswith('p(') and part.endswith(')'):
-            # Extract components inside the parallel section
-            parallel_str = part[2:-1]  # Remove p( and )
-            parallel_components = [comp.strip() for comp in parallel_str.split(',')]
 
-            # Convert component strings to schemdraw elements
-            elements = []
-            labels = []
-            for comp in parallel_components:
-                if not comp:  # Skip empty components
-                    continue
-
-                # Extract component type and identifier
-                comp_type = comp[0]  # First character is the type (R, C, L, etc.)
-                comp_id = comp[1:]   # Rest is the identifier
-
-                if comp_type in component_map:
-                    elements.append(component_map[comp_type])
-                    labels.append(comp_type + comp_id)
-                else:
-                    print(f"Warning: Unknown component type '{comp_type}' in '{comp}'")
+# Below this many circuits, draw_circuits_batch draws in the calling process
+# since starting the worker processes costs more than it saves
+_MIN_PARALLEL_CIRCUITS = 8
 
-            # Draw the parallel combination
-            if elements:
-                drawing = draw_parallel_elements(
-                    drawing=drawing,
-                    elements=elements,
-                    start_pos=current_pos,
-                    direction=direction,
-                    spacing=spacing,
-                    labels=labels
-                )
-
-                # Update current position to the end of the parallel section
-                if direction == 'right':
-                    current_pos = (current_pos[0] + branch_length, current_pos[1])  # Using 3 as branch_length from draw_parallel_elements
-                elif direction == 'left':
-                    current_pos = (current_pos[0] - branch_length, current_pos[1])
-                elif direction == 'up':
-                    current_pos = (current_pos[0], current_pos[1] + branch_length)
-                else:  # down
-                    current_pos = (current_pos[0], current_pos[1] - branch_length)
-
-        # Individual component
-        elif part:
-            comp_type = part[0]  # First character is the type (R, C, L, etc.)
-            comp_id = part[1:]   # Rest is the identifier
-
-            if comp_type in component_map:
-                # Add the component
-                component = component_map[comp_type]()
-                component = component.label(part)
-
-                if direction == 'right':
-                    drawing.add(component.at(current_pos).right())
-                elif direction == 'left':
-                    drawing.add(component.at(current_pos).left())
-                elif direction == 'up':
-                    drawing.add(component.at(current_pos).up())
-                else:  # down
-                    drawing.add(component.at(current_pos).down())
-
-                # Add label
-                component.label(comp_id)
-
-                # Update current position
-                current_pos = component.end
+
+def draw_circuits_batch(circuits, start_pos=(0, 0), direction='right', spacing=1, workers=None) -> list[schemdraw.Drawing]:
+    """
+    Draw many circuit strings, in parallel worker processes for large batches.
+
+    Parameters:
+    - circuits: sequence of circuit strings (see draw_circuit for the format)
+    - start_pos, direction, spacing: passed to draw_circuit for every circuit
+    - workers: number of worker processes (default: number of CPUs)
+
+    Returns:
+    - list of Drawing objects, in the same order as circuits
+
+    Workers are separate processes, so scripts calling this should guard
+    their entry point with ``if __name__ == '__main__':``.
+    """
+    circuits = list(circuits)
+    draw = functools.partial(draw_circuit, start_pos=start_pos, direction=direction, spacing=spacing)
+
+    if len(circuits) < _MIN_PARALLEL_CIRCUITS or workers == 1:
+        return [draw(circuit) for circuit in circuits]
+
+    # A few chunks per worker keeps the pickling overhead low while still
+    # balancing circuits of different sizes between the workers
+    chunksize = max(1, len(circuits) // (workers or os.cpu_count() or 1) // 4)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(draw, circuits, chunksize=chunksize))
+
+@functools.lru_cache(maxsize=32)
+def _freq_grid(frequency_range):
+    """
+    Log-spaced frequency grid for a (start_freq, end_freq, num_points) tuple.
+
+    The grid is cached and shared between calls, so it is read-only.
+    """
+    start_freq, end_freq, num_points = frequency_range
+    frequencies = np.logspace(np.log10(start_freq), np.log10(end_freq), num=num_points)
+    frequencies.flags.writeable = False
+    return frequencies
+
+
+# Closed-form impedances of impedance.py elements, evaluated for a whole batch
+# of parameter sets at once. p has one row per parameter set and one column per
+# element parameter, jw is 2j*pi*f with shape (1, n_freqs).
+_BATCH_ELEMENTS = {
+    'R': lambda p, jw: p[:, 0:1] + 0 * jw,
+    'C': lambda p, jw: 1.0 / (p[:, 0:1] * jw),
+    'L': lambda p, jw: p[:, 0:1] * jw,
+    'W': lambda p, jw: p[:, 0:1] * (1 - 1j) / np.sqrt(jw.imag),
+    'Wo': lambda p, jw: p[:, 0:1] / (np.sqrt(jw * p[:, 1:2]) * np.tanh(np.sqrt(jw * p[:, 1:2]))),
+    'Ws': lambda p, jw: p[:, 0:1] * np.tanh(np.sqrt(jw * p[:, 1:2])) / np.sqrt(jw * p[:, 1:2]),
+    'CPE': lambda p, jw: 1.0 / (p[:, 0:1] * jw ** p[:, 1:2]),
+    'La': lambda p, jw: (p[:, 0:1] * jw) ** p[:, 1:2],
+}
+
+
+def _predict_series(chain, parameters, constants, frequencies, jw, index):
+    """
+    Impedance of a parsed series chain for every parameter set.
+
+    Parameters are consumed in circuit string order, like impedance.py does.
+
+    Returns:
+    - Z: complex array of shape (n_sets, n_freqs)
+    - index: column of the next unused parameter
+    """
+    Z = np.zeros((parameters.shape[0], jw.shape[1]), dtype=np.complex128)
+    for kind, value, _ in chain:
+        if kind == 'parallel':
+            admittance = np.zeros_like(Z)
+            for branch in value:
+                Z_branch, index = _predict_series(branch, parameters, constants, frequencies, jw, index)
+                admittance += 1.0 / Z_branch
+            Z += 1.0 / admittance
+            continue
+
+        raw_elem = get_element_from_name(value)
+        num_params = circuit_elements[raw_elem].num_params
+        columns = []
+        for j in range(num_params):
+            name = value if num_params == 1 else f"{value}_{j}"
+            if name in constants:
+                columns.append(np.full(parameters.shape[0], constants[name], dtype=np.float64))
             else:
-                print(f"Warning: Unknown component type '{comp_type}' in '{part}'")
+                columns.append(parameters[:, index])
+                index += 1
+        p = np.stack(columns, axis=1)
+
+        if raw_elem in _BATCH_ELEMENTS:
+            Z += _BATCH_ELEMENTS[raw_elem](p, jw)
+        else:
+            # No closed form here, evaluate the impedance.py element per parameter set
+            element = circuit_elements[raw_elem]
+            Z += np.array([element(row.tolist(), frequencies.tolist()) for row in p])
+    return Z, index
 
-    return drawing
 
-def plot_circuit(circuit, frequency_range=(0.1, 1e5, 50), title="Custom Circuit"):
+def predict_batch(circuit, parameters, frequencies):
+    """
+    Predict the impedance of a CustomCircuit for many parameter sets at once.
+
+    Parameters:
+    - circuit: impedance.models.circuits.CustomCircuit object
+    - parameters: array of shape (n_sets, n_params), one parameter set per row,
+      in the same order as circuit.parameters_ (constants excluded)
+    - frequencies: array of frequencies (Hz)
+
+    Returns:
+    - complex array of shape (n_sets, n_freqs) with the impedance of each parameter set
+    """
+    parameters = np.atleast_2d(np.asarray(parameters, dtype=np.float64))
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+
+    # j*omega is built once and broadcast over all parameter sets
+    jw = 2j * np.pi * frequencies[None, :]
+
+    num_params = calculateCircuitLength(circuit.circuit) - len(circuit.constants)
+    if parameters.shape[1] != num_params:
+        raise ValueError(f"Circuit '{circuit.circuit}' takes {num_params} parameters, "
+                         f"got {parameters.shape[1]}")
+
+    chain = _parse_circuit(circuit.circuit)
+    Z, _ = _predict_series(chain, parameters, circuit.constants, frequencies, jw, 0)
+    return Z
+
+
+@functools.lru_cache(maxsize=64)
+def _circuit_svg(circuit_string):
+    """SVG image of a circuit string's schematic, cached by the circuit string."""
+    # schemdraw's own SVG backend, the matplotlib one would leave a pyplot
+    # figure open for every circuit
+    return draw_circuit(circuit_string).draw(show=False, canvas='svg').getimage('svg').decode()
+
+
+@dataclasses.dataclass(eq=False)
+class CircuitPlots(Mapping):
+    """
+    Result of plot_circuit.
+
+    Works like the dictionary plot_circuit used to return, with the keys
+    'drawing', 'bode_plot' and 'nyquist_plot'. The schematic is drawn on first
+    access to `drawing`, so callers that only use the plots never pay for it.
+    With svg_cache, 'drawing' is replaced by 'drawing_svg', the cached SVG
+    image of the schematic.
+    """
+    circuit_string: str
+    bode_plot: object
+    nyquist_plot: object
+    svg_cache: bool = False
+
+    @functools.cached_property
+    def drawing(self) -> schemdraw.Drawing:
+        return draw_circuit(self.circuit_string)
+
+    @property
+    def drawing_svg(self) -> str:
+        return _circuit_svg(self.circuit_string)
+
+    def _keys(self):
+        return ('drawing_svg' if self.svg_cache else 'drawing', 'bode_plot', 'nyquist_plot')
+
+    def __getitem__(self, key):
+        if key not in self._keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        # Mapping.__contains__ would look the value up and draw the schematic
+        return key in self._keys()
+
+    def __eq__(self, other):
+        # Mapping.__eq__ would compare values and draw the schematic; every
+        # result holds its own figures and drawing, so only identical
+        # results are equal anyway
+        return self is other
+
+    __hash__ = object.__hash__
+
+    def _repr_html_(self):
+        # Notebooks show both plots inline, like the pyplot figures
+        # plot_circuit used to leave open; the schematic isn't drawn
+        images = []
+        for figure in (self.bode_plot, self.nyquist_plot):
+            buffer = io.BytesIO()
+            figure.savefig(buffer, format='png', bbox_inches='tight')
+            data = base64.b64encode(buffer.getvalue()).decode()
+            images.append(f'<div><img src="data:image/png;base64,{data}"></div>')
+        return '\n'.join(images)
+
+    def __iter__(self):
+        return iter(self._keys())
+
+    def __len__(self):
+        return len(self._keys())
+
+
+def plot_circuit(circuit, frequency_range=(0.1, 1e5, 50), title="Custom Circuit", svg_cache=False):
     """
     Draws a representation of a CustomCircuit from impedance.py package and plots its Bode plot
     and Nyquist plot.
@@ -245,33 +771,36 @@ def plot_circuit(circuit, frequency_range=(0.1, 1e5, 50), title="Custom Circuit"
     - circuit: impedance.models.circuits.CustomCircuit object
     - frequency_range: tuple of (start_freq, end_freq, num_points) for the plots
     - title: Title for the plots
+    - svg_cache: if True, return the schematic as a cached SVG string under
+      'drawing_svg' instead of a live Drawing under 'drawing'
 
     Returns:
-    - A dictionary containing the circuit drawing and matplotlib figures
+    - CircuitPlots with the circuit drawing and matplotlib figures, readable
+      like a dictionary; the drawing is only made when it is first accessed.
+      The figures aren't registered with pyplot; notebooks show both of them
+      when the result is the last expression of a cell, otherwise display or
+      save them directly (e.g. IPython's display(fig) or fig.savefig(...)).
     """
-    import numpy as np
-    import matplotlib.pyplot as plt
-    from matplotlib.gridspec import GridSpec
-
     # Extract the circuit string from the CustomCircuit object
     circuit_string = circuit.circuit
 
-    # Draw the circuit schematic
-    drawing = draw_circuit(circuit_string)
-
     # Generate frequencies for the plots
-    start_freq, end_freq, num_points = frequency_range
-    frequencies = np.logspace(np.log10(start_freq), np.log10(end_freq), num=num_points)
+    frequencies = _freq_grid(tuple(frequency_range))
 
     # Calculate impedance values
     Z = circuit.predict(frequencies)
-    Z_mag = np.abs(Z)
-    Z_phase = np.angle(Z, deg=True)
-    Z_real = np.real(Z)
-    Z_imag = np.imag(Z)
+    # Real and imaginary parts are views into Z, magnitude and phase are
+    # computed from them instead of walking the complex array again
+    Z_real = Z.real
+    Z_imag = Z.imag
+    Z_mag = np.hypot(Z_real, Z_imag)
+    Z_phase = np.degrees(np.arctan2(Z_imag, Z_real))
 
     # Create figure with subplots for magnitude and phase (Bode plot)
-    bode_fig = plt.figure(figsize=(10, 8))
+    # Figures are created without pyplot, so they aren't kept alive by its
+    # global figure manager and are freed once the caller drops them
+    bode_fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(bode_fig)
     gs = GridSpec(2, 1, height_ratios=[1, 1])
 
     # Magnitude plot
@@ -289,26 +818,27 @@ def plot_circuit(circuit, frequency_range=(0.1, 1e5, 50), title="Custom Circuit"
     ax2.set_ylim(-90, 90)
     ax2.grid(True, which="both", ls="--")
 
-    plt.tight_layout()
+    bode_fig.tight_layout()
 
     # Create Nyquist plot
-    nyquist_fig = plt.figure(figsize=(8, 8))
+    nyquist_fig = Figure(figsize=(8, 8))
+    FigureCanvasAgg(nyquist_fig)
     ax3 = nyquist_fig.add_subplot(111)
-    ax3.plot(Z_real, -Z_imag, 'go-', linewidth=2, markersize=4)
+    neg_imag = -Z_imag
+    ax3.plot(Z_real, neg_imag, 'go-', linewidth=2, markersize=4)
 
     # Add frequency markers
     # Mark a few frequency points on the Nyquist plot
     marker_indices = np.linspace(0, len(frequencies)-1, 5, dtype=int)
-    for idx in marker_indices:
-        ax3.annotate(f"{frequencies[idx]:.1e} Hz",
-                     xy=(Z_real[idx], -Z_imag[idx]),
-                     xytext=(5, 5),
-                     textcoords='offset points',
-                     fontsize=8)
+    marker_labels = [f"{freq:.1e} Hz" for freq in frequencies[marker_indices]]
+    # Plain text artists shifted 5 points up and right, shared by all markers
+    marker_offset = offset_copy(ax3.transData, fig=nyquist_fig, x=5, y=5, units='points')
+    for x, y, label in zip(Z_real[marker_indices], neg_imag[marker_indices], marker_labels):
+        ax3.text(x, y, label, transform=marker_offset, fontsize=8)
 
     # Set better axis limits to reduce empty space
-    x_min, x_max = min(Z_real), max(Z_real)
-    y_min, y_max = min(-Z_imag), max(-Z_imag)
+    x_min, x_max = Z_real.min(), Z_real.max()
+    y_min, y_max = neg_imag.min(), neg_imag.max()
     
     # Calculate padding - use a smaller percentage to reduce empty space
     padding = 0.05 * max(x_max - x_min, y_max - y_min)
@@ -331,13 +861,32 @@ def plot_circuit(circuit, frequency_range=(0.1, 1e5, 50), title="Custom Circuit"
     ax3.axhline(y=0, color='k', linestyle='--', alpha=0.3)
     ax3.axvline(x=0, color='k', linestyle='--', alpha=0.3)
 
-    plt.tight_layout()
-
-    return {
-        'drawing': drawing,
-        'bode_plot': bode_fig,
-        'nyquist_plot': nyquist_fig
-    }
+    nyquist_fig.tight_layout()
+
+    return CircuitPlots(
+        circuit_string=circuit_string,
+        bode_plot=bode_fig,
+        nyquist_plot=nyquist_fig,
+        svg_cache=svg_cache
+    )
+
+
+if numba is not None:
+    @numba.njit(numba.float64(numba.complex128[::1], numba.complex128[::1]),
+                cache=True, fastmath=True, nogil=True)
+    def _chi2_kernel(Z_exp, Z_pred):
+        # Single pass over both arrays, no temporary residual array
+        s = 0.0
+        for i in range(Z_exp.shape[0]):
+            d = Z_exp[i] - Z_pred[i]
+            s += d.real * d.real + d.imag * d.imag
+        return s
+else:
+    def _chi2_kernel(Z_exp, Z_pred):
+        # Complex residuals; |d|^2 = real^2 + imag^2, so the real and
+        # imaginary parts don't have to be split into separate arrays
+        residuals = Z_exp - Z_pred
+        return np.vdot(residuals, residuals).real
 
 
 def chi2(Z_exp, Z_pred):
@@ -355,15 +904,23 @@ def chi2(Z_exp, Z_pred):
     --------
     float
         Chi-squared value
+
+    Notes:
+    ------
+    With numba installed the summation runs without holding the GIL, so many
+    chi2 evaluations can run in parallel threads, e.g.
+    ``ThreadPoolExecutor().map(chi2, Z_exps, Z_preds)``.
     """
-    # Calculate the real and imaginary residuals
-    real_residuals = np.real(Z_exp) - np.real(Z_pred)
-    imag_residuals = np.imag(Z_exp) - np.imag(Z_pred)
-    
+    # Inputs broadcast against each other like in elementwise NumPy code
+    # (raises ValueError if their shapes don't fit), then the kernel gets
+    # flat, contiguous complex128 arrays of equal length
+    Z_exp, Z_pred = np.broadcast_arrays(np.asarray(Z_exp, dtype=np.complex128),
+                                        np.asarray(Z_pred, dtype=np.complex128))
+    Z_exp = np.ascontiguousarray(Z_exp).ravel()
+    Z_pred = np.ascontiguousarray(Z_pred).ravel()
+
     # Sum of squared residuals
-    chi2 = (real_residuals**2 + imag_residuals**2).sum()
-    
-    return chi2
+    return float(_chi2_kernel(Z_exp, Z_pred))
 
 
 def show_parameters(circuit):
@@ -384,20 +941,21 @@ def show_parameters(circuit):
     # Get parameter names and values
     param_names = circuit.get_param_names()
     param_values = circuit.parameters_
-    
-    # Create a dictionary to store parameters and values
-    params_dict = {}
-    for name, value in zip(param_names[0], param_values):
-        # Convert name to string if it's not a string (e.g., if it's a list)
-        key = str(name) if not isinstance(name, str) else name
-        params_dict[key] = f"{value:.6g}"  # Format to 6 significant digits
-    
+
+    # Names and values are kept as separate arrays; str() returns strings
+    # unchanged, so non-string names (e.g. lists) need no separate check
+    names = np.array([str(name) for name in param_names[0]], dtype=object)
+    values = np.asarray(param_values, dtype=np.float64)
+    # Format all values to 6 significant digits in one vectorized call
+    value_strs = np.char.mod('%.6g', values)
+
     # Return a formatted string representation for non-notebook environments
-    max_param_len = max(len(param) for param in param_names)
-    table_str = "Circuit Parameters:\n"
-    table_str += "=" * (max_param_len + 15) + "\n"
-    
-    for param, value in params_dict.items():
-        table_str += f"{param:<{max_param_len}} | {value}\n"
-    
+    max_param_len = max((len(name) for name in names), default=0)
+    rows = ["Circuit Parameters:", "=" * (max_param_len + 15)]
+
+    # Format spec is built once for all rows
+    row_format = f"{{:<{max_param_len}}} | {{}}"
+    rows.extend(row_format.format(name, value) for name, value in zip(names, value_strs))
+
+    table_str = "\n".join(rows) + "\n"
     print(table_str)